@@ -1,41 +1,68 @@
 """Defines package version dynamically"""
 
-import re
 import sys
 import subprocess
+from functools import cache
+from functools import cached_property
 from pathlib import Path
 from packaging.version import Version
 
 
-_PATTERN = re.compile(r"(def _get_version_from_git_tags\(default: str = )'.*'(\):)")
+_VERSION_FILE = Path(__file__).with_name('_version.py')
+# Package sits at ``src/omnidict`` of its git repository in source checkouts
+_SOURCE_ROOT = Path(__file__).resolve().parent.parent.parent
 
 
+@cache
 def _get_version_from_git_tags(default: str = '1.0.0a4'):
 
-    def set_version_as_default(version: str):
-        content = Path(__file__).read_text()
-        new_content = re.sub(_PATTERN, r'\1' + f"{version!r}" + r'\2', content)
-        Path(__file__).write_text(new_content)
+    def store_version(version: str):
+        content = f"__version__ = {version!r}\n"
+        try:
+            if not _VERSION_FILE.is_file() or _VERSION_FILE.read_text() != content:
+                _VERSION_FILE.write_text(content)
+        except OSError:
+            pass
 
-    cmd = subprocess.run(['git', 'tag'], capture_output=True)
-    versions = sorted(map(Version, cmd.stdout.decode().splitlines()))
-    if not versions:
-        if not default:
-            raise SystemError('Cannot resolve package version')
-        return default
-    set_version_as_default(version := str(versions[-1]))
-    return version
+    def git_tags() -> list[str]:
+        # Only package's own repository is asked, never the caller's one
+        if not (_SOURCE_ROOT / '.git').exists():
+            return []
+        try:
+            cmd = subprocess.run(
+                ['git', 'tag'], cwd=_SOURCE_ROOT, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL, text=True
+            )
+        except OSError:
+            return []
+        return cmd.stdout.splitlines()
+
+    if versions := git_tags():
+        store_version(version := str(max(map(Version, versions))))
+        return version
+    # Installed copies use version stored when package was built
+    try:
+        from ._version import __version__
+    except ImportError:
+        pass
+    else:
+        return __version__
+    if not default:
+        raise SystemError('Cannot resolve package version')
+    return default
 
 
 # If you do following line, function is called everytime package is imported
-# but using class approach, only when accessing `__version__` function is called
+# but using class approach, only when accessing `__version__` function is called.
+# ``cached_property`` stores the result in the module ``__dict__``, so following
+# accesses are plain attribute lookups
 
 #  __version__ = _get_version_from_git_tags()
 
 
 class This(sys.__class__):
 
-    @property
+    @cached_property
     def __version__(self) -> str:
         return _get_version_from_git_tags()
 
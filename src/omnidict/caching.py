@@ -1,6 +1,11 @@
 # Builtins
+from types import CodeType
+from collections import OrderedDict
+from inspect import ismethod
+from inspect import CO_VARARGS
+from inspect import CO_VARKEYWORDS
+from functools import cache
 from functools import wraps
-from itertools import starmap
 # Local
 from omnidict import repositories
 # Types
@@ -16,6 +21,19 @@ from typing import Concatenate
 _T = TypeVar('_T')
 _R = TypeVar('_R', bound=repositories.KeyValueRepository)
 _P = ParamSpec('_P')
+_MISSING = object()
+
+
+@cache
+def _argspec(code: CodeType, bound: bool = False) -> tuple[int, int, tuple[str, ...]]:
+    """Number of positional-only arguments, number of positional arguments and
+    names of all named arguments, for given function code.
+
+    When ``bound`` is ``True`` first argument (``self`` or ``cls``) is skipped
+    """
+    skip = int(bound)
+    varnames = code.co_varnames[skip:code.co_argcount + code.co_kwonlyargcount]
+    return max(code.co_posonlyargcount - skip, 0), code.co_argcount - skip, varnames
 
 
 class Cache(Generic[_R]):
@@ -27,6 +45,12 @@ class Cache(Generic[_R]):
     You set ``repository`` attribute to define how cache should be stored. Default
     it uses in memory dictionary.
 
+    You set ``memo_size`` to keep up to that many most recently used results in
+    process memory, in front of ``repository``. Memoized results are returned
+    without accessing ``repository``, so they are not affected by its expiration.
+    They are also the very same objects every time, unlike results loaded from
+    ``repository``, so mutating a memoized result changes what later calls return.
+
     When you use ``Cache`` instance to decorate a function, the keyword-only
     ``ignore_cache`` argument is added to its signature so you can avoid using
     cached values
@@ -39,6 +63,7 @@ class Cache(Generic[_R]):
         self,
         repository: Optional[_R] = None,
         result_validator: Optional[Callable[[Any], bool]] = None,
+        memo_size: int = 0,
     ):
         if result_validator is not None:
             self.validate = result_validator
@@ -48,40 +73,86 @@ class Cache(Generic[_R]):
             self.repository: _R = repositories.DictRepository()
         else:
             self.repository: _R = repository
+        self.memo_size: int = memo_size
+        self._memo: OrderedDict[str, Any] = OrderedDict()
+
+    def _memoize(self, key: str, value: Any) -> None:
+        """Keeps ``value`` in memory, forgetting least recently used values when
+        there are more than ``memo_size``
+        """
+        if self.memo_size <= 0:
+            return
+        # Re-inserting moves key to the end and never raises on concurrent eviction
+        self._memo.pop(key, None)
+        self._memo[key] = value
+        if len(self._memo) > self.memo_size:
+            try:
+                self._memo.popitem(last=False)
+            except KeyError:
+                pass
 
     @classmethod
     def key_from_function_call(cls, func: Callable, *args, **kwargs) -> str:
         """Creates cache key for given function, arguments and keyword
         arguments
         """
-        def all_as_kwargs(*args, **kwargs):
-            in_args, in_kwargs = list(args), dict()
-            npos = func.__code__.co_posonlyargcount
-            nargs = func.__code__.co_argcount + func.__code__.co_kwonlyargcount
-            varnames = list(func.__code__.co_varnames[:nargs][::-1])
-            for i, varname in enumerate(varnames, start=1):
-                # Take kwonly args from kwargs
-                try:
-                    in_kwargs[varname] = kwargs[varname]
-                except KeyError:
-                    pass
-                else:
-                    continue
-                # Leave remaining args in kwargs
-                if (nargs - len(in_kwargs)) == npos:
-                    break
-                # Move pos args to kwargs when possible
-                try:
-                    in_kwargs[varname] = in_args.pop(-1)
-                except IndexError:
-                    pass
-            return in_args, in_kwargs
+        return cls._key_builder(func)(args, kwargs)
 
+    @classmethod
+    def _key_builder(cls, func: Callable) -> Callable[[tuple, dict], str]:
+        """Creates a function that builds cache keys for calls to ``func`` from
+        its arguments and keyword arguments. Everything that does not depend on
+        call arguments is computed only once
+        """
+        npos, nargs, varnames = _argspec(func.__code__, ismethod(func))
         prefix = f"{func.__module__}.{func.__name__}"
-        in_args, in_kwargs = all_as_kwargs(*args, **kwargs)
-        argstr = cls.param_sep.join(map(str, in_args))
-        kwargstr = cls.param_sep.join(starmap("{}={}".format, in_kwargs.items()))
-        return f"{prefix}{cls.fun_sep}{argstr}{cls.type_sep}{kwargstr}"
+        fun_sep, type_sep, param_sep = cls.fun_sep, cls.type_sep, cls.param_sep
+
+        def all_as_kwargs(args, kwargs):
+            # Positional-only args stay in args, remaining ones become kwargs
+            named = dict(zip(varnames[npos:nargs], args[npos:]))
+            named.update(kwargs)
+            in_args = list(args[:npos]) + list(args[nargs:])
+            in_kwargs = {varname: named[varname] for varname in reversed(varnames)
+                         if varname in named}
+            # Keep kwargs collected by ``**kwargs`` in a deterministic order
+            if len(in_kwargs) < len(named):
+                in_kwargs.update(sorted(
+                    (k, v) for k, v in named.items() if k not in in_kwargs
+                ))
+            return in_args, in_kwargs
+
+        def build_key(args: tuple, kwargs: dict) -> str:
+            in_args, in_kwargs = all_as_kwargs(args, kwargs)
+            argstr = param_sep.join(map(str, in_args)) if in_args else ""
+            kwargstr = "" if not in_kwargs else param_sep.join(
+                k + "=" + str(v) for k, v in in_kwargs.items()
+            )
+            return "".join((prefix, fun_sep, argstr, type_sep, kwargstr))
+
+        def build_key_pos_only(args: tuple, kwargs: dict) -> str:
+            if kwargs:
+                return build_key(args, kwargs)
+            return "".join((prefix, fun_sep, param_sep.join(map(str, args)), type_sep))
+
+        def build_key_kw_only(args: tuple, kwargs: dict) -> str:
+            named = dict(zip(varnames, args))
+            named.update(kwargs)
+            pairs = [k + "=" + str(named[k]) for k in rvarnames if k in named]
+            # Unexpected arguments are left to the general builder
+            if len(args) > nargs or len(pairs) < len(named):
+                return build_key(args, kwargs)
+            return "".join((prefix, fun_sep, type_sep, param_sep.join(pairs)))
+
+        # Specialize builder for signatures without variadic arguments
+        if func.__code__.co_flags & (CO_VARARGS | CO_VARKEYWORDS):
+            return build_key
+        if npos == len(varnames):
+            return build_key_pos_only
+        if npos == 0:
+            rvarnames = varnames[::-1]
+            return build_key_kw_only
+        return build_key
 
     @classmethod
     def function_call_from_key(
@@ -101,42 +172,50 @@ class Cache(Generic[_R]):
             Function fully qualified name, call arguments and call keyword
             arguments
         """
-        prefix, argstr_and_kwargstr = key.split(cls.fun_sep)
-        argstr, kwargstr = argstr_and_kwargstr.split(cls.type_sep)
-        args = tuple(map(str, filter(bool, argstr.split(cls.param_sep))))
-        kwargs_tuple = tuple(filter(bool, kwargstr.split(cls.param_sep)))
-        kwargs = dict(map(lambda s: s.split('=', 1), kwargs_tuple))
+        prefix, _, argstr_and_kwargstr = key.partition(cls.fun_sep)
+        argstr, _, kwargstr = argstr_and_kwargstr.partition(cls.type_sep)
+        args = tuple(filter(bool, argstr.split(cls.param_sep)))
+        kwargs = dict(
+            s.partition('=')[::2] for s in kwargstr.split(cls.param_sep) if s
+        )
         return prefix, args, kwargs
 
     def __call__(
         self,
         func: Callable[_P, _T]
     ) -> Callable[Concatenate[bool, _P], _T]:
+        build_key = self._key_builder(func)
 
         @wraps(func)
         def inner_func(
             *args: _P.args, ignore_cache: bool = False, **kwargs: _P.kwargs
         ) -> _T:
-            try:
-                cache_key = self.key_from_function_call(func, *args, **kwargs)
-            except IndexError:
-                raise TypeError(
-                    f"Cannot create cache key for called {func} with {args=} "
-                    f"and {kwargs=}"
-                )
+            cache_key = build_key(args, kwargs)
             # Retrieve key from cache
             if not ignore_cache:
-                # Scan cache using None as default
-                old_default = self.repository.default
-                self.repository.default = lambda _: None
-                result = self.repository.get(cache_key)
-                self.repository.default = old_default
-                if result is not None:
+                if (result := self._memo.get(cache_key, _MISSING)) is not _MISSING:
+                    try:
+                        self._memo.move_to_end(cache_key)
+                    except KeyError:
+                        # Evicted by another thread meanwhile
+                        pass
+                    return result
+                result = self.repository.get(cache_key, _MISSING)
+                if result is not _MISSING:
+                    self._memoize(cache_key, result)
                     return result
             # Retrieve key calling function
             result = func(*args, **kwargs)
             if self.validate(result):
-                self.repository.set(cache_key, result)
+                if ignore_cache:
+                    self.repository.set(cache_key, result)
+                else:
+                    # Key was just missed, there is nothing to delete first
+                    try:
+                        self.repository[cache_key] = result
+                    except KeyError:
+                        self.repository.set(cache_key, result)
+                self._memoize(cache_key, result)
             return result
 
         return inner_func
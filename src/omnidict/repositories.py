@@ -3,18 +3,29 @@ Storage classes that unifies interactions with key-value stored information
 """
 # Builtins
 import re
+import os
 import abc
-import json
+import mmap
 import pickle
-import random
 import shelve
 import tempfile
-from hashlib import md5
+from hashlib import blake2b
+from functools import cache
+from functools import lru_cache
+from functools import partial
+from operator import add
+from itertools import islice
 from pathlib import Path
-from base64 import b64encode
-from datetime import datetime, timedelta, timezone
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from time import time
 # Installed
-from cryptography.fernet import Fernet
+import msgspec
+from cryptography.fernet import InvalidToken
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 # Types
 from typing import Any
 from typing import Self
@@ -22,19 +33,113 @@ from typing import Generic
 from typing import TypeVar
 from typing import Optional
 from typing import Callable
+from typing import Mapping
+from typing import Iterable
 from typing import Iterator
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
+    import lmdb
     from redis import Redis
 
 
 _T = TypeVar('_T')
 _SeedType = None | int | float | str | bytes | bytearray
+_MISSING = object()
+_ENCODER = msgspec.msgpack.Encoder()
+_PICKLE_EXT_CODE = 1
+_SPECIALIZED_ATTRS = frozenset({
+    'prefix', 'cipher', 'customize_key', 'serialize_val', 'unserialize_val'
+})
+_CUSTOMIZED_KEYS_CACHE_SIZE = 4096
+_MSGPACK_SCALARS = frozenset({str, bytes, int, float, bool, type(None)})
+_MAX_PENDING_WRITES = 1024
+_MMAP_MIN_SIZE = 1 << 20
+_SCAN_COUNT = 1000
+
+
+class _AEADCipher:
+    """AES-256-GCM cipher exposing same ``encrypt``/``decrypt`` interface as
+    :class:`cryptography.fernet.Fernet`
+
+    Tokens are ``nonce || ciphertext || tag``. GCM is a stream mode, so there is
+    no padding, and it is hardware accelerated (AES-NI, CLMUL) by OpenSSL.
+    """
+    nonce_size = 12
+
+    def __init__(self, key: bytes):
+        self._aead = AESGCM(key)
+
+    def encrypt(self, data: bytes) -> bytes:
+        nonce = os.urandom(self.nonce_size)
+        return nonce + self._aead.encrypt(nonce, data, None)
+
+    def decrypt(self, token: bytes) -> bytes:
+        # Slicing a memoryview does not copy the ciphertext
+        token = memoryview(token)
+        try:
+            return self._aead.decrypt(
+                token[:self.nonce_size], token[self.nonce_size:], None
+            )
+        except InvalidTag:
+            raise InvalidToken from None
 
 
-def _now() -> datetime:
-    """TZ-aware UTC located now"""
-    return datetime.now(tz=timezone.utc)
+@cache
+def _build_cipher(passphrase: bytes) -> _AEADCipher:
+    """Cipher derived from ``passphrase``, shared by every repository using it"""
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=b'omnidict', info=b'aes-256-gcm')
+    return _AEADCipher(hkdf.derive(passphrase))
+
+
+def _write_and_close(fd: int, filepath: str, data: bytes) -> None:
+    """Writes ``data`` into file descriptor ``fd`` of ``filepath``, closing it
+    afterwards. ``filepath`` is removed when writing fails, so no partially written
+    file is left behind
+    """
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+    except BaseException:
+        try:
+            os.unlink(filepath)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _pickle_ext_hook(code: int, data: memoryview) -> Any:
+    """Loads values that msgpack could not encode natively"""
+    if code == _PICKLE_EXT_CODE:
+        return pickle.loads(data)
+    return msgspec.msgpack.Ext(code, bytes(data))
+
+
+_DECODER = msgspec.msgpack.Decoder(ext_hook=_pickle_ext_hook)
+
+
+class _MsgpackMixin:
+    """Serializes values with :mod:`msgspec` msgpack
+
+    Only scalars are encoded natively, anything else is pickled inside a msgpack
+    extension so every Python object (tuples, sets, instances...) is loaded
+    unchanged
+    """
+    _encoder = msgspec.msgpack.Encoder()
+    _decoder = msgspec.msgpack.Decoder(ext_hook=_pickle_ext_hook)
+
+    @classmethod
+    def serialize_val(cls, val: Any) -> bytes:
+        if type(val) in _MSGPACK_SCALARS:
+            try:
+                return cls._encoder.encode(val)
+            except OverflowError:
+                pass
+        ext = msgspec.msgpack.Ext(_PICKLE_EXT_CODE, pickle.dumps(val, pickle.HIGHEST_PROTOCOL))
+        return cls._encoder.encode(ext)
+
+    @classmethod
+    def unserialize_val(cls, val: bytes) -> Any:
+        return cls._decoder.decode(val)
 
 
 class KeyValueRepository(abc.ABC, Generic[_T]):
@@ -50,7 +155,11 @@ class KeyValueRepository(abc.ABC, Generic[_T]):
     Repositories might define :attr:`KeyValueRepository.default` which ensures that
     :class:`KeyError` is not raised when value requested through
     :meth:`KeyValueRepository.__getitem__` does not exists.
+
+    Repositories where :meth:`KeyValueRepository.customize_key` is expensive set
+    ``_cache_customized_keys`` so most recently used keys are customized only once.
     """
+    _cache_customized_keys: bool = False
 
     def __init__(
         self,
@@ -71,12 +180,9 @@ class KeyValueRepository(abc.ABC, Generic[_T]):
         else:
             self._has_default = True
             self.default = default
-        if not passphrase:
-            self._is_encrypted = False
-            self.cipher = None
-        else:
-            self._is_encrypted = True
-            self.cipher = self.build_cipher(passphrase)
+        self.cipher: None | _AEADCipher = (
+            self.build_cipher(passphrase) if passphrase else None
+        )
 
     @property
     def has_default(self) -> bool:
@@ -84,41 +190,97 @@ class KeyValueRepository(abc.ABC, Generic[_T]):
 
     @property
     def is_encrypted(self) -> bool:
-        return self._is_encrypted
+        return self.cipher is not None
 
     def __repr__(self) -> str:
         return f"{type(self).__name__}(storage={repr(self.storage)})"
 
-    def __init_subclass__(cls: type[Self]) -> None:
-        super().__init_subclass__()
-        delitem = cls.__delitem__
-        cls.__delitem__ = lambda self, key: delitem(self, self.customize_key(key))
-        getitem = cls.__getitem__
-        cls.__getitem__ = lambda self, key: cls.unserialize_val(
-            getitem(self, self.customize_key(key)) if not self.is_encrypted
-            else self.cipher.decrypt(getitem(self, self.customize_key(key)))
-        )
-        setitem = cls.__setitem__
-        cls.__setitem__ = lambda self, key, value: setitem(
-            self, self.customize_key(key),
-            cls.serialize_val(value) if not self.is_encrypted
-            else self.cipher.encrypt(cls.serialize_val(value))
-        )
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in _SPECIALIZED_ATTRS and 'cipher' in self.__dict__:
+            self._specialize()
+
+    def __delattr__(self, name: str) -> None:
+        super().__delattr__(name)
+        if name in _SPECIALIZED_ATTRS and 'cipher' in self.__dict__:
+            self._specialize()
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Specialized accessors are bound to this instance, copies bind their own
+        state = self.__dict__.copy()
+        for name in ('_getitem', '_setitem', '_delitem'):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        if 'cipher' in self.__dict__:
+            self._specialize()
+
+    def _specialize(self) -> None:
+        """Binds item accessors for current cipher, key customization and
+        serialization, so they are not looked up nor branched on every access.
+
+        It is called again whenever any of them is replaced
+        """
+        customize_key = self.customize_key
+        # Default customization is a plain concatenation, done without a frame
+        if getattr(customize_key, '__func__', None) is KeyValueRepository.customize_key:
+            customize_key = partial(add, self.prefix)
+        elif self._cache_customized_keys:
+            customize_key = lru_cache(maxsize=_CUSTOMIZED_KEYS_CACHE_SIZE)(customize_key)
+        serialize_val, unserialize_val = self.serialize_val, self.unserialize_val
+        get_raw, set_raw, del_raw = self._get_raw, self._set_raw, self._del_raw
+        if self.cipher is None:
+            self._getitem = lambda key: unserialize_val(get_raw(customize_key(key)))
+            self._setitem = lambda key, value: set_raw(
+                customize_key(key), serialize_val(value)
+            )
+        else:
+            encrypt, decrypt = self.cipher.encrypt, self.cipher.decrypt
+            self._getitem = lambda key: unserialize_val(
+                decrypt(get_raw(customize_key(key)))
+            )
+            self._setitem = lambda key, value: set_raw(
+                customize_key(key), encrypt(serialize_val(value))
+            )
+        self._delitem = lambda key: del_raw(customize_key(key))
+
+    def _dump_val(self, val: Any) -> bytes:
+        """Serializes (and encrypts if needed) value as it is stored"""
+        if not self.is_encrypted:
+            return self.serialize_val(val)
+        return self.cipher.encrypt(self.serialize_val(val))
+
+    def _load_val(self, val: bytes) -> Any:
+        """Decrypts (if needed) and de-serializes value as it was stored"""
+        if not self.is_encrypted:
+            return self.unserialize_val(val)
+        return self.unserialize_val(self.cipher.decrypt(val))
 
     @staticmethod
-    def build_cipher(passphrase: _SeedType) -> Fernet:
-        random.seed(passphrase)
-        return Fernet(key=b64encode(random.randbytes(32)))
+    def build_cipher(passphrase: _SeedType) -> _AEADCipher:
+        # Cipher cache is keyed on bytes, ``True`` and ``1.0`` are equal but differ
+        if isinstance(passphrase, bytearray):
+            passphrase = bytes(passphrase)
+        elif not isinstance(passphrase, bytes):
+            passphrase = str(passphrase).encode()
+        return _build_cipher(passphrase)
 
     @staticmethod
     def serialize_val(val: Any) -> bytes:
         """Serializes any Python object into bytes"""
-        return json.dumps(val).encode()
+        try:
+            return _ENCODER.encode(val)
+        except OverflowError:
+            # msgpack integers are at most 64 bits, bigger ones are pickled
+            ext = msgspec.msgpack.Ext(_PICKLE_EXT_CODE, pickle.dumps(val, pickle.HIGHEST_PROTOCOL))
+            return _ENCODER.encode(ext)
 
     @staticmethod
     def unserialize_val(val: bytes) -> Any:
         """De-serializes bytes into original Python object"""
-        return json.loads(val.decode())
+        return _DECODER.decode(val)
 
     @classmethod
     def from_existing(
@@ -133,7 +295,9 @@ class KeyValueRepository(abc.ABC, Generic[_T]):
         raise NotImplementedError()
 
     def _expire(self, key: str) -> None:
-        """Marks provided ``key`` to be forgotten after provided ``seconds`` """
+        """Marks provided ``key`` to be forgotten after ``expire_seconds``. Only
+        called when ``expire_seconds`` is greater than 0
+        """
         raise NotImplementedError(f"{type(self).__name__} does not support expire keys")
 
     def iter_matching(self, pattern: str) -> Iterator[tuple[str, Any]]:
@@ -142,22 +306,40 @@ class KeyValueRepository(abc.ABC, Generic[_T]):
 
     def customize_key(self, key: str) -> str:
         """Converts key into a different string, by default :python:`"prefix:{}".format`"""
-        return f"{self.prefix}{key}"
+        return self.prefix + key
 
     @abc.abstractmethod
-    def __getitem__(self, key: str) -> Any:
-        """Gets value associated to provided ``key``, raising ``KeyError`` if not found"""
+    def _get_raw(self, key: str) -> bytes:
+        """Gets stored bytes associated to already customized ``key``, raising
+        ``KeyError`` if not found
+        """
         ...
 
     @abc.abstractmethod
-    def __delitem__(self, key: str) -> None:
-        """Deletes provided ``key`` from storage, raising ``KeyError`` if not found"""
+    def _del_raw(self, key: str) -> None:
+        """Deletes already customized ``key`` from storage, raising ``KeyError`` if
+        not found
+        """
         ...
 
     @abc.abstractmethod
+    def _set_raw(self, key: str, value: bytes) -> None:
+        """Sets stored bytes associated to already customized ``key``, raising
+        ``KeyError`` if exists
+        """
+        ...
+
+    def __getitem__(self, key: str) -> Any:
+        """Gets value associated to provided ``key``, raising ``KeyError`` if not found"""
+        return self._getitem(key)
+
+    def __delitem__(self, key: str) -> None:
+        """Deletes provided ``key`` from storage, raising ``KeyError`` if not found"""
+        self._delitem(key)
+
     def __setitem__(self, key: str, value: Any) -> None:
         """Sets value associated to provided ``key``, raising ``KeyError`` if exists"""
-        ...
+        self._setitem(key, value)
 
     def delete(self, key: str) -> None:
         """Deletes provided ``key`` from storage doing nothing if not found"""
@@ -166,21 +348,48 @@ class KeyValueRepository(abc.ABC, Generic[_T]):
         except KeyError:
             pass
 
-    def get(self, key: str) -> Any:
-        """Gets value associated to provided ``key``, returning ``None`` if not found"""
+    def get(self, key: str, default: Any = _MISSING) -> Any:
+        """Gets value associated to provided ``key``, returning ``default`` if not
+        found. When ``default`` is not provided :attr:`KeyValueRepository.default`
+        is called with ``key``
+        """
         try:
             return self[key]
         except KeyError:
-            return self.default(key)
+            if default is _MISSING:
+                return self.default(key)
+            return default
 
     def set(self, key: str, value: Any) -> None:
         """Sets ``value`` associated to provided ``key`` overwritting if key exists"""
         self.delete(key)
         self[key] = value
 
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        """Gets values associated to provided ``keys``, keys not found are
+        associated to ``default``
+        """
+        return {key: self.get(key) for key in keys}
+
+    def set_many(self, mapping: Mapping[str, Any]) -> None:
+        """Sets values associated to provided keys overwritting keys that exist"""
+        for key, value in mapping.items():
+            self.set(key, value)
+
+    def del_many(self, keys: Iterable[str]) -> None:
+        """Deletes provided ``keys`` from storage doing nothing for keys not found"""
+        for key in keys:
+            self.delete(key)
+
 
 class DictRepository(KeyValueRepository[dict]):
-    """In-Memory :class:`dict` used as storage"""
+    """In-Memory :class:`dict` used as storage
+
+    Item access is bound by interpreter overhead, not by bytes moved: a hit is a key
+    customization, a dict lookup, an optional expiration update and a de-serialization.
+    Item accessors are specialized (see :meth:`KeyValueRepository._specialize`) so
+    each of them runs as few Python frames and attribute lookups as possible
+    """
 
     def __init__(
         self,
@@ -192,100 +401,155 @@ class DictRepository(KeyValueRepository[dict]):
         default: None | Callable[[str], Any] = None
     ):
         super().__init__(storage or dict(), expire_seconds, passphrase, prefix=prefix, default=default)
-        self.expire_storage: dict[str, datetime] = dict()
+        self.expire_storage: dict[str, float] = dict()
 
     def _expire(self, key: str) -> None:
-        if self.expire_seconds <= 0:
-            return
-        self.expire_storage[key] = _now() + timedelta(seconds=self.expire_seconds)
+        self.expire_storage[key] = time() + self.expire_seconds
+
+    def set_many(self, mapping: Mapping[str, Any]) -> None:
+        values = {
+            self.customize_key(key): self._dump_val(val) for key, val in mapping.items()
+        }
+        self.storage.update(values)
+        if self.expire_seconds > 0:
+            self.expire_storage.update(dict.fromkeys(values, time() + self.expire_seconds))
 
     def iter_matching(self, pattern: str) -> Iterator[tuple[str, Any]]:
+        # Literal patterns (optionally ending with ``.*``) only match prefixes
+        literal = pattern[:-2] if pattern.endswith('.*') else pattern
+        if re.escape(literal) == literal:
+            match = lambda key: key.startswith(literal)
+        else:
+            match = re.compile(pattern).match
         for key, val in self.storage.items():
-            if re.match(pattern, key):
+            if match(key):
                 yield key, val
 
-    def __getitem__(self, key: str) -> Any:
+    def _get_raw(self, key: str) -> bytes:
         value = self.storage.get(key)
         if (value is None):
             raise KeyError(f"Key '{key}' not found")
-        if (
-            (self.expire_seconds > 0)
-            and ((ttl := self.expire_storage.get(key)) is not None)
-            and (ttl < _now())
-        ):
-            del self[key]
-            raise KeyError(f"Key '{key}' has expired")
-        self._expire(key)
+        if self.expire_seconds > 0:
+            if ((ttl := self.expire_storage.get(key)) is not None) and (ttl < time()):
+                self._del_raw(key)
+                raise KeyError(f"Key '{key}' has expired")
+            self._expire(key)
         return value
 
-    def __delitem__(self, key: str) -> None:
+    def _del_raw(self, key: str) -> None:
         try:
             del self.storage[key]
         except KeyError:
             raise KeyError(f"Key '{key}' not found")
         self.expire_storage.pop(key, None)
 
-    def __setitem__(self, key: str, value: Any) -> None:
+    def _set_raw(self, key: str, value: bytes) -> None:
         if key in self.storage:
             raise KeyError(f"Key '{key}' already stored")
         self.storage[key] = value
-        self._expire(key)
+        if self.expire_seconds > 0:
+            self._expire(key)
 
 
-class RedisRepository(KeyValueRepository['Redis']):
+class RedisRepository(_MsgpackMixin, KeyValueRepository['Redis']):
     R"""Redis service used as storage
 
     - Keys can be modified with ``prefix``, customizing
       :method:`KeyValueRepository.customize_key` or customizing redis client (storage)
-    - Values are :mod:`pickle`\ .dumped and loaded, to allow arbitrary Python
-      objects
+    - Values are :mod:`msgspec` msgpack encoded, :mod:`pickle`\ .dumped when
+      needed to allow arbitrary Python objects
     - Results might not persist when Redis restarts, depending on configuration
 
     """
-    @staticmethod
-    def serialize_val(val: Any) -> bytes:
-        return pickle.dumps(val)
-
-    @staticmethod
-    def unserialize_val(val: bytes) -> Any:
-        return pickle.loads(val)
-
     def _expire(self, key: str) -> None:
-        if self.expire_seconds <= 0:
-            return
         self.storage.expire(key, time=self.expire_seconds)
 
-    def iter_matching(self, pattern: str) -> Iterator[tuple[str, Any]]:
-        yield from self.storage.scan_iter(pattern)
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        """Gets values associated to provided ``keys`` in a single round trip,
+        keys not found are associated to ``default``
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        customized_keys = [self.customize_key(key) for key in keys]
+        if self.expire_seconds > 0:
+            # ``GET`` and ``EXPIRE`` instead of ``GETEX``, that requires Redis 6.2
+            with self.storage.pipeline(transaction=False) as pipe:
+                for key in customized_keys:
+                    pipe.get(key)
+                    pipe.expire(key, self.expire_seconds)
+                values = pipe.execute()[::2]
+        else:
+            values = self.storage.mget(customized_keys)
+        return {
+            key: self.default(key) if val is None else self._load_val(val)
+            for key, val in zip(keys, values)
+        }
+
+    def set_many(self, mapping: Mapping[str, Any]) -> None:
+        """Sets values associated to provided keys in a single round trip,
+        overwritting keys that exist
+        """
+        with self.storage.pipeline(transaction=False) as pipe:
+            for key, value in mapping.items():
+                pipe.set(
+                    self.customize_key(key), self._dump_val(value),
+                    ex=self.expire_seconds if self.expire_seconds > 0 else None
+                )
+            pipe.execute()
+
+    def del_many(self, keys: Iterable[str]) -> None:
+        """Deletes provided ``keys`` in a single ``DEL``"""
+        if customized_keys := [self.customize_key(key) for key in keys]:
+            self.storage.delete(*customized_keys)
 
-    def __getitem__(self, key: str) -> Any:
+    def iter_matching(self, pattern: str) -> Iterator[tuple[str, Any]]:
+        yield from self.storage.scan_iter(match=pattern, count=_SCAN_COUNT)
+
+    def iter_matching_with_values(self, pattern: str) -> Iterator[tuple[str, Any]]:
+        """Iterates over (key, value) pairs of keys that match provided pattern,
+        getting values of each batch of scanned keys in a single ``MGET``
+        """
+        keys = self.storage.scan_iter(match=pattern, count=_SCAN_COUNT)
+        while batch := list(islice(keys, _SCAN_COUNT)):
+            for key, val in zip(batch, self.storage.mget(batch)):
+                # Keys might be deleted between scan and get
+                if val is not None:
+                    yield key, self._load_val(val)
+
+    def _get_raw(self, key: str) -> bytes:
         val = self.storage.get(key)
         if val is None:
             raise KeyError(f"Key '{key}' not found")
-        self._expire(key)
+        if self.expire_seconds > 0:
+            self._expire(key)
         return val
 
-    def __delitem__(self, key: str) -> None:
-        if self.storage.get(key) is None:
+    def _del_raw(self, key: str) -> None:
+        if not self.storage.delete(key):
             raise KeyError(f"Key '{key}' not found")
-        self.storage.delete(key)
 
-    def __setitem__(self, key: str, value: Any) -> None:
-        if self.storage.get(key) is not self.default(key):
+    def _set_raw(self, key: str, value: bytes) -> None:
+        expire_seconds = self.expire_seconds if self.expire_seconds > 0 else None
+        if not self.storage.set(key, value, nx=True, ex=expire_seconds):
             raise KeyError(f"Key '{key}' already stored")
-        self.storage[key] = value
-        self._expire(key)
 
 
-class DirectoryRepository(KeyValueRepository[Path]):
+class DirectoryRepository(_MsgpackMixin, KeyValueRepository[Path]):
     R"""Directory used as storage
 
     - Keys are hashed to avoid issues with file names.
-    - Values are :mod:`pickle`\ .dumped and loaded, to allow arbitrary Python
-      objects
+    - Values are :mod:`msgspec` msgpack encoded, :mod:`pickle`\ .dumped when
+      needed to allow arbitrary Python objects
     - Results are persisted in local filesystem
+    - Files are written in background by ``io_workers`` threads when it is
+      greater than 0. Accessing a key waits for its pending write, and
+      :meth:`DirectoryRepository.flush` waits for all of them. Errors of failed
+      writes are raised by whichever of them waits first
 
     """
+    _cache_customized_keys = True
+
     def __init__(
         self,
         directory: Path | str = '',
@@ -293,57 +557,97 @@ class DirectoryRepository(KeyValueRepository[Path]):
         passphrase: _SeedType = '',
         *,
         prefix: str = '',
-        default: None | Callable[[str], Any] = None
+        default: None | Callable[[str], Any] = None,
+        io_workers: int = 0
     ):
         storage = Path(directory or tempfile.mkdtemp())
         if storage.is_file():
             raise TypeError(f"DirectoryRepository initialized with file path '{storage}'")
         super().__init__(storage, expire_seconds, passphrase, prefix=prefix, default=default)
         self.storage.mkdir(exist_ok=True, parents=True)
-        self.expire_storage = shelve.DbfilenameShelf(tempfile.mktemp())
+        self.expire_storage: dict[str, float] = dict()
+        self._io_pool = ThreadPoolExecutor(io_workers) if io_workers > 0 else None
+        self._pending: dict[str, Future] = dict()
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name == 'storage':
+            # Plain string concatenation is much cheaper than ``Path`` joins
+            self._storage_str = os.fspath(value) + os.sep
+
+    def flush(self) -> None:
+        """Waits until every pending write is done, raising the first error of
+        failed writes
+        """
+        pending, self._pending = self._pending, dict()
+        errors = [exc for future in pending.values() if (exc := future.exception())]
+        if errors:
+            raise errors[0]
+
+    def _wait_pending(self, key: str) -> None:
+        if (future := self._pending.pop(key, None)) is not None:
+            future.result()
+
+    def _specialize(self) -> None:
+        # Only built-in de-serialization is known to read memory mapped values
+        unserialize_func = getattr(self.unserialize_val, '__func__', None)
+        self._mmap_values = unserialize_func is _MsgpackMixin.unserialize_val.__func__
+        super()._specialize()
 
     def customize_key(self, key: str):
-        return super().customize_key(md5(key.encode()).hexdigest())
-
-    @staticmethod
-    def serialize_val(val: Any) -> bytes:
-        return pickle.dumps(val)
-
-    @staticmethod
-    def unserialize_val(val: bytes) -> Any:
-        return pickle.loads(val)
+        return self.prefix + blake2b(key.encode(), digest_size=16).hexdigest()
 
     def _expire(self, key: str) -> None:
-        if self.expire_seconds <= 0:
-            return
-        self.expire_storage[key] = _now() + timedelta(seconds=self.expire_seconds)
-
-    def __getitem__(self, key: str) -> Any:
-        filepath = self.storage / f"{key}.pickle"
-        if not filepath.exists():
-            raise KeyError(f"Key '{key}' not found")
-        if (
-            (self.expire_seconds > 0)
-            and ((ttl := self.expire_storage.get(key)) is not None)
-            and (ttl < _now())
-        ):
-            del self[key]
+        self.expire_storage[key] = time() + self.expire_seconds
+
+    def _get_raw(self, key: str) -> bytes | memoryview:
+        self._wait_pending(key)
+        filepath = self._storage_str + key + ".pickle"
+        expires = self.expire_seconds > 0
+        if expires and ((ttl := self.expire_storage.get(key)) is not None) and (ttl < time()):
+            self._del_raw(key)
             raise KeyError(f"Key '{key}' has expired")
-        self._expire(key)
-        return filepath.read_bytes()
+        try:
+            with open(filepath, 'rb') as f:
+                # Big files are mapped so deserializer reads them without a copy
+                if self._mmap_values and os.fstat(f.fileno()).st_size >= _MMAP_MIN_SIZE:
+                    value = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                else:
+                    value = f.read()
+        except FileNotFoundError:
+            raise KeyError(f"Key '{key}' not found")
+        # Serialized values are never empty, file was just created and is being written
+        if not value:
+            raise KeyError(f"Key '{key}' not found")
+        if expires:
+            self._expire(key)
+        return value
 
-    def __delitem__(self, key: str) -> None:
-        filepath = self.storage / f"{key}.pickle"
-        if not filepath.exists():
+    def _del_raw(self, key: str) -> None:
+        self._wait_pending(key)
+        try:
+            os.unlink(self._storage_str + key + ".pickle")
+        except FileNotFoundError:
             raise KeyError(f"Key '{key}' not found")
-        filepath.unlink()
 
-    def __setitem__(self, key: str, value: Any) -> None:
-        filepath = self.storage / f"{key}.pickle"
-        if filepath.exists():
+    def _set_raw(self, key: str, value: bytes) -> None:
+        filepath = self._storage_str + key + ".pickle"
+        # Existence check and creation happen in a single syscall
+        try:
+            fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        except FileExistsError:
             raise KeyError(f"Key '{key}' already stored")
-        self._expire(key)
-        filepath.write_bytes(value)
+        if self.expire_seconds > 0:
+            self._expire(key)
+        if self._io_pool is None:
+            _write_and_close(fd, filepath, value)
+            return
+        if len(self._pending) >= _MAX_PENDING_WRITES:
+            # Failed writes are kept so their errors are raised
+            self._pending = {
+                k: f for k, f in self._pending.items() if not f.done() or f.exception()
+            }
+        self._pending[key] = self._io_pool.submit(_write_and_close, fd, filepath, value)
 
 
 class DbFilenameRepository(KeyValueRepository[shelve.DbfilenameShelf]):
@@ -367,68 +671,120 @@ class DbFilenameRepository(KeyValueRepository[shelve.DbfilenameShelf]):
             raise TypeError(f"DbFilenameRepository initialized with file path '{filepath}'")
         storage = shelve.DbfilenameShelf(filepath or tempfile.mktemp())
         super().__init__(storage, expire_seconds, passphrase, prefix=prefix, default=default)
-        self.expire_storage = shelve.DbfilenameShelf(tempfile.mktemp())
+        self.expire_storage: dict[str, float] = dict()
 
     def _expire(self, key: str) -> None:
-        if self.expire_seconds <= 0:
-            return
-        self.expire_storage[key] = _now() + timedelta(seconds=self.expire_seconds)
+        self.expire_storage[key] = time() + self.expire_seconds
 
-    def __getitem__(self, key: str) -> Any:
+    def _get_raw(self, key: str) -> bytes:
         value = self.storage.get(key)
         if (value is None):
             raise KeyError(f"Key '{key}' not found")
-        if (
-            (self.expire_seconds > 0)
-            and ((ttl := self.expire_storage.get(key)) is not None)
-            and (ttl < _now())
-        ):
-            del self[key]
-            raise KeyError(f"Key '{key}' has expired")
-        self._expire(key)
+        if self.expire_seconds > 0:
+            if ((ttl := self.expire_storage.get(key)) is not None) and (ttl < time()):
+                self._del_raw(key)
+                raise KeyError(f"Key '{key}' has expired")
+            self._expire(key)
         return value
 
-    def __delitem__(self, key: str) -> None:
+    def _del_raw(self, key: str) -> None:
         try:
             del self.storage[key]
         except KeyError:
             raise KeyError(f"Key '{key}' not found")
         self.expire_storage.pop(key, None)
 
-    def __setitem__(self, key: str, value: Any) -> None:
+    def _set_raw(self, key: str, value: bytes) -> None:
         if key in self.storage:
             raise KeyError(f"Key '{key}' already stored")
         self.storage[key] = value
-        self._expire(key)
+        if self.expire_seconds > 0:
+            self._expire(key)
+
+
+class LmdbRepository(KeyValueRepository['lmdb.Environment']):
+    R"""LMDB environment used as storage, requires :mod:`lmdb` to be installed
+
+    - Keys are preserved, except empty ones and those longer than LMDB maximum key
+      size, which are hashed
+    - Values are stored as they are serialized, with no extra pickling layer
+    - Results are persisted in local filesystem, memory-mapped and readable
+      concurrently by other processes
+    """
+    def __init__(
+        self,
+        directory: str | Path = '',
+        expire_seconds: int = 0,
+        passphrase: _SeedType = '',
+        *,
+        prefix: str = '',
+        default: None | Callable[[str], Any] = None,
+        map_size: int = 2 ** 30
+    ):
+        import lmdb
+
+        if Path(directory).is_file():
+            raise TypeError(f"LmdbRepository initialized with file path '{directory}'")
+        storage = lmdb.open(os.fspath(directory or tempfile.mkdtemp()), map_size=map_size)
+        super().__init__(storage, expire_seconds, passphrase, prefix=prefix, default=default)
+        self.expire_storage: dict[str, float] = dict()
+        self._max_key_size: int = storage.max_key_size()
+
+    def _expire(self, key: str) -> None:
+        self.expire_storage[key] = time() + self.expire_seconds
+
+    def _encode_key(self, key: str) -> bytes:
+        """Key as stored in LMDB, which refuses empty and too long keys"""
+        encoded = key.encode()
+        if 0 < len(encoded) <= self._max_key_size:
+            return encoded
+        return b'\0' + blake2b(encoded, digest_size=32).digest()
+
+    def _get_raw(self, key: str) -> bytes:
+        with self.storage.begin() as txn:
+            value = txn.get(self._encode_key(key))
+        if value is None:
+            raise KeyError(f"Key '{key}' not found")
+        if self.expire_seconds > 0:
+            if ((ttl := self.expire_storage.get(key)) is not None) and (ttl < time()):
+                self._del_raw(key)
+                raise KeyError(f"Key '{key}' has expired")
+            self._expire(key)
+        return value
+
+    def _del_raw(self, key: str) -> None:
+        with self.storage.begin(write=True) as txn:
+            if not txn.delete(self._encode_key(key)):
+                raise KeyError(f"Key '{key}' not found")
+        self.expire_storage.pop(key, None)
+
+    def _set_raw(self, key: str, value: bytes) -> None:
+        with self.storage.begin(write=True) as txn:
+            if not txn.put(self._encode_key(key), value, overwrite=False):
+                raise KeyError(f"Key '{key}' already stored")
+        if self.expire_seconds > 0:
+            self._expire(key)
 
 
-class DefaultRepository(KeyValueRepository[dict]):
+class DefaultRepository(_MsgpackMixin, KeyValueRepository[dict]):
     """Repository that always returns values from ``default``"""
 
     def __init__(self, *, prefix: str = '', default: Callable[[str | bytes], str | bytes]):
         super().__init__(dict(), expire_seconds=0, prefix=prefix, default=default)
 
-    @staticmethod
-    def serialize_val(val: Any) -> bytes:
-        return pickle.dumps(val)
-
-    @staticmethod
-    def unserialize_val(val: bytes) -> Any:
-        return pickle.loads(val)
-
-    def __getitem__(self, key: str) -> Any:
+    def _get_raw(self, key: str) -> bytes:
         """Keys are defined when retrieved from the first time"""
         try:
             return self.storage[key]
         except KeyError:
             pass
-        self[key] = self.default(key)
-        return self[key]
+        value = self.storage[key] = self._dump_val(self.default(key))
+        return value
 
-    def __delitem__(self, key: str) -> None:
+    def _del_raw(self, key: str) -> None:
         self.storage.pop(key, None)
 
-    def __setitem__(self, key: str, value: Any) -> None:
+    def _set_raw(self, key: str, value: bytes) -> None:
         if key in self.storage:
             raise KeyError(f"Key '{key}' already stored")
         self.storage[key] = value
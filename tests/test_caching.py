@@ -52,6 +52,43 @@ def test_key_from_function_call():
     case.assertEqual(key_3, 'test_caching.m:?:1:&:c=3:::b=2')
 
 
+def test_key_from_function_call_variadic():
+
+    def g(a, *args, b, **kwargs):
+        return 0
+
+    key_1 = caching.Cache.key_from_function_call(g, 1, 2, 3, b=4, z=5, y=6)
+    case.assertEqual(key_1, 'test_caching.g:?:2:::3:&:b=4:::a=1:::y=6:::z=5')
+    key_2 = caching.Cache.key_from_function_call(g, 1, 2, 3, b=4, z=5, y=7)
+    case.assertNotEqual(key_1, key_2, "Different function calls are equal")
+
+
+def test_key_from_function_call_specialized():
+
+    def pos_only(a, b, /):
+        return 0
+
+    def kw_only(a, b, *, c):
+        return 0
+
+    key_1 = caching.Cache.key_from_function_call(pos_only, 1, 2)
+    case.assertEqual(key_1, 'test_caching.pos_only:?:1:::2:&:')
+    key_2 = caching.Cache.key_from_function_call(kw_only, 1, 2, c=3)
+    case.assertEqual(key_2, 'test_caching.kw_only:?::&:c=3:::b=2:::a=1')
+    key_3 = caching.Cache.key_from_function_call(kw_only, 1, c=3, b=2)
+    case.assertEqual(key_2, key_3, "Equivalent function calls are different")
+
+
+def test_key_from_function_call_defaults_do_not_collide():
+
+    def h(a=1, b=2):
+        return 0
+
+    key_1 = caching.Cache.key_from_function_call(h, 1)
+    key_2 = caching.Cache.key_from_function_call(h, b=1)
+    case.assertNotEqual(key_1, key_2, "Different function calls are equal")
+
+
 def test_funcion_call_from_key():
     key_1 = "test_caching.f:?:1:::2:&:f=6:::e=5:::d=4:::c=3"
     _, args_1, kwargs_1 = caching.Cache.function_call_from_key(key_1)
@@ -96,3 +133,41 @@ def test_cache_calls_function_when_cache_ignored(call_a, call_b, call_key):
     result = call_b()
     assert result == 0, 'Result differs from expected'
     assert (prev_counter + 1) == case.call_counter[call_key], 'Cached method not called'
+
+
+def test_cache_memo_does_not_access_repository():
+    repository = repositories.DictRepository()
+    memo_cache = caching.Cache(repository, memo_size=1)
+
+    @memo_cache
+    def g(a):
+        return [a]
+
+    g(1)
+    with mock.patch.object(repository, 'get') as get:
+        assert g(1) == [1], 'Result differs from expected'
+        get.assert_not_called()
+        g(2)
+        g(1)
+        assert get.call_count == 2, 'Memo keeps more results than `memo_size`'
+
+
+def test_cache_long_key_in_lmdb():
+    lmdb_cache = caching.Cache(repositories.LmdbRepository())
+
+    @lmdb_cache
+    def g(a):
+        return len(a)
+
+    assert g(list(range(200))) == 200, 'Result differs from expected'
+    assert g(list(range(200))) == 200, 'Cached result differs from expected'
+
+
+def test_cache_memo_returns_same_object():
+    memo_cache = caching.Cache(memo_size=1)
+
+    @memo_cache
+    def g(a):
+        return [a]
+
+    assert g(1) is g(1), 'Memoized result is not the same object'
@@ -1,7 +1,14 @@
+import os
+import copy
+import json
+import errno
+from unittest import mock
 from uuid import uuid4
 from datetime import datetime, timedelta
 import pytest
+from redis import Redis
 from fakeredis import FakeRedis
+from fakeredis import FakeServer
 from omnidict import repositories
 from typing import Callable
 from cryptography.fernet import InvalidToken
@@ -15,13 +22,17 @@ DEFAULT_ENCRYPTED_KW = {'expire_seconds': 60, 'passphrase': 'test'}
 STANDARD_REPOS: list[RepositoryFactory] = [
     lambda **kw: repositories.DictRepository(**(DEFAULT_STANDARD_KW | kw)),
     lambda **kw: repositories.DirectoryRepository(**(DEFAULT_STANDARD_KW | kw)),
+    lambda **kw: repositories.DirectoryRepository(io_workers=2, **(DEFAULT_STANDARD_KW | kw)),
     lambda **kw: repositories.DbFilenameRepository(**(DEFAULT_STANDARD_KW | kw)),
+    lambda **kw: repositories.LmdbRepository(**(DEFAULT_STANDARD_KW | kw)),
     lambda **kw: repositories.RedisRepository(FakeRedis(), **(DEFAULT_STANDARD_KW | kw)),
 ]
 ENCRYPTED_REPOS: list[RepositoryFactory] = [
     lambda **kw: repositories.DictRepository(**(DEFAULT_ENCRYPTED_KW | kw)),
     lambda **kw: repositories.DirectoryRepository(**(DEFAULT_ENCRYPTED_KW | kw)),
+    lambda **kw: repositories.DirectoryRepository(io_workers=2, **(DEFAULT_ENCRYPTED_KW | kw)),
     lambda **kw: repositories.DbFilenameRepository(**(DEFAULT_ENCRYPTED_KW | kw)),
+    lambda **kw: repositories.LmdbRepository(**(DEFAULT_ENCRYPTED_KW | kw)),
     lambda **kw: repositories.RedisRepository(FakeRedis(), **(DEFAULT_ENCRYPTED_KW | kw)),
 ]
 DEFAULT_REPO: list[RepositoryFactory] = [
@@ -38,6 +49,58 @@ def test_customize_key(repository_factory: RepositoryFactory):
     assert repository.customize_key('key').endswith(':bbb'), 'Key not customized'
 
 
+@pytest.mark.parametrize('repository_factory', STANDARD_REPOS + ENCRYPTED_REPOS)
+def test_customize_key_applies_to_items(repository_factory: RepositoryFactory):
+    repository = repository_factory()
+    repository['key'] = '1'
+    repository.customize_key = "aaa:{}:bbb".format
+    with pytest.raises(KeyError):
+        repository['key']
+
+
+@pytest.mark.parametrize('repository_factory', STANDARD_REPOS + ENCRYPTED_REPOS)
+def test_prefix_change_applies_to_items(repository_factory: RepositoryFactory):
+    repository = repository_factory()
+    repository['key'] = '1'
+    repository.prefix = 'testing::'
+    with pytest.raises(KeyError):
+        repository['key']
+
+
+@pytest.mark.parametrize('repository_factory', STANDARD_REPOS + ENCRYPTED_REPOS)
+def test_customize_key_deleted_applies_to_items(repository_factory: RepositoryFactory):
+    repository = repository_factory()
+    repository.customize_key = "aaa:{}:bbb".format
+    del repository.customize_key
+    repository['key'] = '1'
+    repository.customize_key = "aaa:{}:bbb".format
+    with pytest.raises(KeyError):
+        repository['key']
+
+
+def test_patched_serialize_val_restored():
+    repository = repositories.DictRepository()
+    with mock.patch.object(repository, 'serialize_val', return_value=b'\xc0'):
+        repository['a'] = '1'
+    repository['b'] = '2'
+    assert repository['b'] == '2', 'Patched `serialize_val` still used'
+
+
+@pytest.mark.parametrize('repository_factory', [
+    lambda **kw: repositories.DictRepository(**kw),
+    lambda **kw: repositories.DictRepository(passphrase='test', **kw),
+])
+def test_copy_binds_own_storage(repository_factory: RepositoryFactory):
+    repository = repository_factory()
+    repository['a'] = '1'
+    repository_copy = copy.copy(repository)
+    repository_copy.storage = dict()
+    repository_copy['b'] = '2'
+    assert repository_copy['b'] == '2', '`__getitem__` on copy'
+    assert 'b' not in repository.storage, 'Copy writes into original storage'
+    assert repository['a'] == '1', '`__getitem__` on original'
+
+
 @pytest.mark.parametrize('repository_factory', ALL_REPOS)
 def test_customize_key_prefix(repository_factory: RepositoryFactory):
     repository = repository_factory(prefix='testing::')
@@ -57,6 +120,13 @@ def test_get_not_found_by_method(repository_factory):
     assert repository.get('a') is repository.default('a'), '`get` non existing key'
 
 
+@pytest.mark.parametrize('repository_factory', STANDARD_REPOS + ENCRYPTED_REPOS)
+def test_get_not_found_by_method_with_default(repository_factory):
+    repository = repository_factory()
+    default = object()
+    assert repository.get('a', default) is default, '`get` non existing key with default'
+
+
 @pytest.mark.parametrize('repository_factory', ALL_REPOS)
 def test_get_existing(repository_factory):
     repository = repository_factory()
@@ -64,6 +134,28 @@ def test_get_existing(repository_factory):
     assert repository['a'] == '1', '`__getitem__` existing key'
 
 
+@pytest.mark.parametrize('repository_factory', STANDARD_REPOS + ENCRYPTED_REPOS)
+@pytest.mark.parametrize('value', [2 ** 70, -2 ** 64, [1, 2 ** 70]])
+def test_get_existing_big_int(repository_factory, value):
+    repository = repository_factory()
+    repository['a'] = value
+    assert repository['a'] == value, '`__getitem__` existing big int'
+
+
+@pytest.mark.parametrize('repository_factory', [
+    lambda **kw: repositories.DirectoryRepository(**(DEFAULT_STANDARD_KW | kw)),
+    lambda **kw: repositories.RedisRepository(FakeRedis(), **(DEFAULT_STANDARD_KW | kw)),
+    lambda **kw: repositories.DirectoryRepository(**(DEFAULT_ENCRYPTED_KW | kw)),
+    lambda **kw: repositories.RedisRepository(FakeRedis(), **(DEFAULT_ENCRYPTED_KW | kw)),
+])
+@pytest.mark.parametrize('value', [b'1', 2 ** 70, ('1', 2), {'1': {2, 3}}, datetime(2000, 1, 1)])
+def test_get_existing_python_object(repository_factory, value):
+    repository = repository_factory()
+    repository['a'] = value
+    assert repository['a'] == value, '`__getitem__` existing Python object'
+    assert type(repository['a']) is type(value), '`__getitem__` changes object type'
+
+
 @pytest.mark.parametrize('repository_factory',  ALL_REPOS)
 def test_get_existing_by_method(repository_factory):
     repository = repository_factory()
@@ -164,3 +256,157 @@ def test_encrypted_values(repository_factory):
     repository.cipher = repository.build_cipher('other')
     with pytest.raises(InvalidToken):
         repository.get('a')
+
+
+def test_cipher_does_not_depend_on_equal_passphrases():
+    true_cipher = repositories.DictRepository(passphrase=True).cipher
+    float_cipher = repositories.DictRepository(passphrase=1.0).cipher
+    assert float_cipher is not true_cipher, 'Cipher shared by different passphrases'
+    assert float_cipher is repositories.DictRepository(passphrase='1.0').cipher, (
+        'Cipher not shared by same passphrase'
+    )
+
+
+@pytest.mark.parametrize('repository_factory', STANDARD_REPOS + ENCRYPTED_REPOS)
+def test_set_many_get_many_del_many(repository_factory):
+    repository = repository_factory()
+    repository['a'] = '0'
+    repository.set_many({'a': '1', 'b': '2'})
+    assert repository.get_many(['a', 'b', 'c']) == {'a': '1', 'b': '2', 'c': None}, (
+        '`get_many` values differ from `set_many` ones'
+    )
+    repository.del_many(['a', 'c'])
+    assert repository.get_many(['a', 'b']) == {'a': None, 'b': '2'}, (
+        '`del_many` does not delete keys'
+    )
+
+
+@pytest.mark.parametrize('passphrase', ['', 'test'])
+@pytest.mark.parametrize('expire_seconds', [0, 60])
+def test_redis_set_many_get_many(passphrase, expire_seconds):
+    repository = repositories.RedisRepository(
+        FakeRedis(), expire_seconds=expire_seconds, passphrase=passphrase
+    )
+    repository['a'] = '0'
+    repository.set_many({'a': '1', 'b': ('2',)})
+    # ``GETEX`` requires Redis 6.2
+    with mock.patch.object(Redis, 'getex', side_effect=AssertionError('GETEX used')):
+        assert repository.get_many(['a', 'b', 'c']) == {'a': '1', 'b': ('2',), 'c': None}, (
+            '`get_many` values differ from `set_many` ones'
+        )
+    if expire_seconds > 0:
+        assert repository.storage.ttl(repository.customize_key('b')) > 0, 'Keys do not expire'
+
+
+def test_directory_flush_writes_pending():
+    repository = repositories.DirectoryRepository(io_workers=2)
+    for i in range(10):
+        repository[str(i)] = i
+    repository.flush()
+    assert all(path.stat().st_size for path in repository.storage.iterdir()), (
+        'Pending writes not flushed'
+    )
+
+
+def test_directory_storage_change_applies_to_items(tmp_path):
+    repository = repositories.DirectoryRepository()
+    repository.storage = tmp_path
+    repository['a'] = '1'
+    assert any(tmp_path.iterdir()), 'Item not stored in new directory'
+    assert repository['a'] == '1', '`__getitem__` after storage change'
+
+
+def _failing_fdopen(fd, *_):
+    os.close(fd)
+    raise OSError(errno.ENOSPC, 'No space left on device')
+
+
+@pytest.mark.parametrize('io_workers', [0, 2])
+def test_directory_failed_write_leaves_no_file(io_workers, monkeypatch):
+    repository = repositories.DirectoryRepository(io_workers=io_workers)
+    with monkeypatch.context() as patch:
+        patch.setattr(repositories.os, 'fdopen', _failing_fdopen)
+        with pytest.raises(OSError):
+            repository['a'] = '1'
+            repository.flush()
+    assert not any(repository.storage.iterdir()), 'Failed write left files'
+    with pytest.raises(KeyError):
+        repository['a']
+
+
+def test_directory_file_being_written_is_missing():
+    repository = repositories.DirectoryRepository()
+    key = repository.customize_key('a')
+    (repository.storage / f"{key}.pickle").touch()
+    with pytest.raises(KeyError):
+        repository['a']
+
+
+def test_directory_failed_write_survives_pending_prune(monkeypatch):
+    monkeypatch.setattr(repositories, '_MAX_PENDING_WRITES', 2)
+    repository = repositories.DirectoryRepository(io_workers=1)
+    with monkeypatch.context() as patch:
+        patch.setattr(repositories.os, 'fdopen', _failing_fdopen)
+        repository['a'] = '1'
+        # Wait for the write to fail before restoring ``os.fdopen``
+        next(iter(repository._pending.values())).exception()
+    for i in range(5):
+        repository[str(i)] = i
+    with pytest.raises(OSError):
+        repository.flush()
+
+
+@pytest.mark.parametrize('passphrase', ['', 'test'])
+def test_directory_get_big_value(passphrase):
+    repository = repositories.DirectoryRepository(passphrase=passphrase)
+    value = b'1' * (2 * repositories._MMAP_MIN_SIZE)
+    repository['a'] = value
+    assert repository['a'] == value, '`__getitem__` big value'
+
+
+def test_directory_get_big_value_custom_serialization():
+    repository = repositories.DirectoryRepository()
+    repository.serialize_val = lambda val: json.dumps(val).encode()
+    repository.unserialize_val = lambda val: json.loads(val.decode())
+    value = '1' * (2 * repositories._MMAP_MIN_SIZE)
+    repository['a'] = value
+    assert repository['a'] == value, '`__getitem__` big value'
+
+
+@pytest.mark.parametrize('key', ['', 'a' * 1000])
+def test_lmdb_unsupported_keys(key):
+    repository = repositories.LmdbRepository()
+    with pytest.raises(KeyError):
+        repository[key]
+    repository[key] = '1'
+    assert repository[key] == '1', '`__getitem__` unsupported key'
+    del repository[key]
+    with pytest.raises(KeyError):
+        repository[key]
+
+
+@pytest.mark.parametrize('pattern, expected', [
+    ('a:', {'a:1', 'a:2'}),
+    ('a:.*', {'a:1', 'a:2'}),
+    ('a:*', {'a:1', 'a:2', 'ab'}),
+    ('.*2', {'a:2', 'b:2'}),
+])
+def test_dict_iter_matching(pattern, expected):
+    repository = repositories.DictRepository()
+    for key in ('a:1', 'a:2', 'ab', 'b:2'):
+        repository[key] = key
+    assert {key for key, _ in repository.iter_matching(pattern)} == expected, (
+        '`iter_matching` keys differ from expected'
+    )
+
+
+@pytest.mark.parametrize('passphrase', ['', 'test'])
+def test_redis_iter_matching_with_values(passphrase):
+    repository = repositories.RedisRepository(
+        FakeRedis(server=FakeServer()), passphrase=passphrase
+    )
+    for key in ('a:1', 'a:2', 'b:1'):
+        repository[key] = key
+    assert dict(repository.iter_matching_with_values('a:*')) == {b'a:1': 'a:1', b'a:2': 'a:2'}, (
+        '`iter_matching_with_values` pairs differ from expected'
+    )